@@ -1,178 +1,364 @@
+import asyncio
 import json
 import logging
+import os
 from pathlib import Path
 
 import httpx
 
 from ctfd_sdk import settings
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger('ctfd')
+
+_OK_STATUS_CODES = frozenset({200, 201})
+_CONFLICT_STATUS_CODES = frozenset({400, 409})
+_CREATE_ENDPOINTS = frozenset({'/users', '/teams', '/challenges', '/flags'})
+_USER_TEMPLATE = {'banned': False, 'fields': (), 'hidden': False, 'verified': True}
+_TEAM_TEMPLATE = {'banned': False, 'country': 'CZ', 'fields': (), 'hidden': False}
+
 
 class CTFdException(Exception):
     pass
 
 
+class CTFdAlreadyExists(CTFdException):
+    pass
+
+
 class CtfdConnector:
-    def __init__(self, admin_token: str, host: str):
+    def __init__(self, admin_token: str, host: str, max_concurrency: int = 16, warmup: bool = False, **client_kwargs):
         admin_token = admin_token or settings.CTFD_ADMIN_TOKEN
         assert admin_token is not None, 'To use ctfd you need to define "CTFD_ADMIN_TOKEN"'
         self.admin_token = admin_token
         host = host or settings.CTFD_HOST
         assert host is not None, 'To use ctfd you need to define "CTFD_HOST"'
         self.host = host.strip('/')
-        self.logger = logging.getLogger('ctfd')
-
-    def __set_args_kwargs(self, *args, **kwargs):
-        url = f'{self.host}/api/v1{args[0]}'
-        if 'headers' not in kwargs:
-            kwargs['headers'] = {}
-        kwargs['headers']['Content-Type'] = 'application/json'
-        kwargs['headers']['Authorization'] = f'Token {self.admin_token}'
-        return (url,) + (args[1:]), kwargs
-
-    def __handle_bad_response(self, func, url, response):
-        if response.status_code in [200, 201]:
+        # extra keyword arguments (timeout, transport, ...) are passed to both httpx clients
+        self._client_kwargs = {
+            'base_url': f'{self.host}/api/v1',
+            'headers': {'Content-Type': 'application/json', 'Authorization': f'Token {self.admin_token}'},
+            'http2': True,
+            'limits': httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=60),
+            **client_kwargs,
+        }
+        self._api_path = httpx.URL(self._client_kwargs['base_url']).path.rstrip('/')
+        # clients are created on first use and released by close()/aclose(), see `_get_client` and `_get_aclient`
+        self._client = None
+        self._aclient = None
+        self._aclient_loop = None
+        self._max_concurrency = max_concurrency
+        self._semaphore = None
+        if warmup:
+            # blocking request, async code should use `await CtfdConnector.create(...)` instead
+            self.warmup()
+
+    @classmethod
+    async def create(cls, admin_token: str, host: str, max_concurrency: int = 16, **client_kwargs):
+        connector = cls(admin_token, host, max_concurrency, **client_kwargs)
+        await connector.awarmup()
+        return connector
+
+    def warmup(self):
+        try:
+            self._get_client().head('/users/me')
+        except httpx.HTTPError as e:
+            logger.warning(f'Unable to warm up connection to CTFd: {e}')
+
+    async def awarmup(self):
+        try:
+            await self._get_aclient().head('/users/me')
+        except httpx.HTTPError as e:
+            logger.warning(f'Unable to warm up connection to CTFd: {e}')
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.Client(**self._client_kwargs)
+        return self._client
+
+    def _get_aclient(self):
+        # pooled connections and the semaphore belong to the event loop that created them
+        loop = asyncio.get_running_loop()
+        if self._aclient is None:
+            self._aclient = httpx.AsyncClient(**self._client_kwargs)
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+            self._aclient_loop = loop
+        elif self._aclient_loop is not loop:
+            raise CTFdException(
+                'Async CTFd client is bound to another event loop, '
+                'release it with `await aclose()` (or `async with`) before switching event loops'
+            )
+        return self._aclient
+
+    def _release_aclient(self):
+        aclient, loop = self._aclient, self._aclient_loop
+        self._aclient = self._aclient_loop = self._semaphore = None
+        return aclient, loop
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        aclient, loop = self._release_aclient()
+        if aclient is None:
             return
-        msg = f'Unable to get response in method {func.__name__} from url {url}  in CTFd: {response.text}'
-        self.logger.warning(msg)
-        raise CTFdException(msg)
+        if loop.is_closed() or loop.is_running():
+            logger.warning('Unable to close async CTFd client outside of its event loop, use `await aclose()`')
+            return
+        loop.run_until_complete(aclient.aclose())
 
-    def aassign_host(func):
-        async def inner(self, *args, **kwargs):
-            args, kwargs = self.__set_args_kwargs(*args, **kwargs)
-            response = await func(self, *args, **kwargs)  # noqa
-            self.__handle_bad_response(func, args[0], response)
-            return response
+    async def aclose(self):
+        if self._aclient is not None and self._aclient_loop is asyncio.get_running_loop():
+            aclient, _ = self._release_aclient()
+            await aclient.aclose()
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
-        return inner
+    async def __aenter__(self):
+        return self
 
-    def assign_host(func):
-        def inner(self, *args, **kwargs):
-            args, kwargs = self.__set_args_kwargs(*args, **kwargs)
-            response = func(self, *args, **kwargs)  # noqa
-            self.__handle_bad_response(func, args[0], response)
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _check(self, response):
+        if response.status_code in _OK_STATUS_CODES:
             return response
+        request = response.request
+        msg = f'Unable to get response in method {request.method} from url {request.url} in CTFd: {response.text}'
+        logger.warning(msg)
+        if self._is_duplicate_create(response):
+            raise CTFdAlreadyExists(msg)
+        raise CTFdException(msg)
 
-        return inner
+    def _is_duplicate_create(self, response):
+        request = response.request
+        return (
+            request.method == 'POST'
+            and request.url.path[len(self._api_path) :] in _CREATE_ENDPOINTS
+            and response.status_code in _CONFLICT_STATUS_CODES
+            and 'already' in response.text
+        )
+
+    async def _arequest(self, method, url, *args, **kwargs):
+        client = self._get_aclient()
+        async with self._semaphore:
+            response = await client.request(method, url, *args, **kwargs)
+        return self._check(response)
 
-    @aassign_host
     async def aget(self, url, *args, **kwargs):
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, *args, **kwargs)
-        return response
+        return await self._arequest('GET', url, *args, **kwargs)
 
-    @aassign_host
     async def apost(self, url, *args, **kwargs):
-        async with httpx.AsyncClient() as client:
-            response = await client.post(url, *args, **kwargs)
-            # response.status_code = 1
-        return response
+        return await self._arequest('POST', url, *args, **kwargs)
 
-    @aassign_host
     async def apatch(self, url, *args, **kwargs):
-        async with httpx.AsyncClient() as client:
-            response = await client.patch(url, *args, **kwargs)
-        return response
+        return await self._arequest('PATCH', url, *args, **kwargs)
 
-    @aassign_host
     async def adelete(self, url, *args, **kwargs):
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(url, *args, **kwargs)
-        return response
+        return await self._arequest('DELETE', url, *args, **kwargs)
 
-    @assign_host
     def get(self, url, *args, **kwargs):
-        with httpx.Client() as client:
-            response = client.get(url, *args, **kwargs)
-        return response
+        return self._check(self._get_client().request('GET', url, *args, **kwargs))
 
-    @assign_host
     def post(self, url, *args, **kwargs):
-        with httpx.Client() as client:
-            response = client.post(url, *args, **kwargs)
-        return response
+        return self._check(self._get_client().request('POST', url, *args, **kwargs))
 
-    @assign_host
     def patch(self, url, *args, **kwargs):
-        with httpx.Client() as client:
-            response = client.patch(url, *args, **kwargs)
-        return response
+        return self._check(self._get_client().request('PATCH', url, *args, **kwargs))
 
-    @assign_host
     def delete(self, url, *args, **kwargs):
-        with httpx.Client() as client:
-            response = client.delete(url, *args, **kwargs)
-        return response
+        return self._check(self._get_client().request('DELETE', url, *args, **kwargs))
 
 
 class Storage:
+    # Several Storage instances (or processes) may share one file: reads are served from the in-memory cache and
+    # flush() merges this instance's pending changes into the file when another writer has replaced it meanwhile.
+    # Writes are not locked, so two flushes at the very same moment can still race.
     def __init__(self, storage_path: str | Path):
         storage_path = storage_path or settings.CTFD_STORAGE
         assert storage_path is not None, 'To use ctfd you need to define "CTFD_STORAGE"'
         self.storage_path = Path(storage_path)
-        self.logger = logging.getLogger('ctfd')
+        self._cache = None
+        self._file_state = None
+        self._pending = {}
+        self._dirty = False
+
+    @staticmethod
+    def _state(stat):
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read(self):
+        try:
+            with open(self.storage_path, 'rb') as f:
+                self._file_state = self._state(os.fstat(f.fileno()))
+                data = f.read()
+        except FileNotFoundError:
+            self._file_state = None
+            return {'users': {}, 'teams': {}, 'challenges': {}, 'flags': {}}
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def _write(self, storage: dict):
+        tmp_path = self.storage_path.with_name(f'{self.storage_path.name}.tmp')
+        if orjson is not None:
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(storage))
+                f.flush()
+                file_state = self._state(os.fstat(f.fileno()))
+        else:
+            with open(tmp_path, 'w') as f:
+                f.write(json.dumps(storage))
+                f.flush()
+                file_state = self._state(os.fstat(f.fileno()))
+        os.replace(tmp_path, self.storage_path)
+        self._file_state = file_state
+
+    def _file_changed(self):
+        try:
+            return self._state(os.stat(self.storage_path)) != self._file_state
+        except FileNotFoundError:
+            return self._file_state is not None
 
     def get_storage(self):
-        if not self.storage_path.exists():
-            with open(self.storage_path, 'w') as f:
-                json.dump({'users': {}, 'teams': {}, 'challenges': {}, 'flags': {}}, f)
-        with open(self.storage_path) as f:
-            return json.load(f)
+        if self._cache is None:
+            self._cache = self._read()
+            if self._file_state is None:
+                self._write(self._cache)
+        return self._cache
 
     def get_field_from_storage(self, field: str, name: str):
-        storage = self.get_storage()
-        if name not in storage[field]:
+        try:
+            return self.get_storage()[field][name]
+        except KeyError:
             msg = f'{name} not found in storage `{field}`'
-            self.logger.warning(msg)
-            raise CTFdException(msg)
-        return storage[field][name]
-
-    def save_storage(self, storage: dict):
-        with open(self.storage_path, 'w') as f:
-            json.dump(storage, f)
-
-    def update_storage_field_from_response(self, response, field: str, name: str):
+            logger.warning(msg)
+            raise CTFdException(msg) from None
+
+    def save_storage(self, storage: dict, flush: bool = True):
+        # replaces the whole storage, changes made by other writers since the last read are overwritten
+        self._cache = storage
+        self._pending = None
+        self._dirty = True
+        if flush:
+            self.flush()
+
+    def flush(self):
+        if not self._dirty:
+            return
+        if self._pending is not None and self._file_changed():
+            storage = self._read()
+            for (field, name), entry in self._pending.items():
+                if entry is None:
+                    storage[field].pop(name, None)
+                else:
+                    storage[field][name] = entry
+            self._cache = storage
+        self._write(self._cache)
+        self._pending = {}
+        self._dirty = False
+
+    def _mark_changed(self, field: str, name: str, entry, flush: bool):
+        if self._pending is not None:
+            self._pending[field, name] = entry
+        self._dirty = True
+        if flush:
+            self.flush()
+
+    def set_storage_field(self, field: str, name: str, entry: dict, flush: bool = True):
+        self.get_storage()[field][name] = entry
+        self._mark_changed(field, name, entry, flush)
+
+    def update_storage_field_from_response(self, response, field: str, name: str, flush: bool = True):
         data = response.json()['data']
-        storage = self.get_storage()
-        storage[field][name] = {'id': data['id']}
-        self.save_storage(storage)
+        self.set_storage_field(field, name, {'id': data['id']}, flush)
 
     def exist_in_field(self, field: str, name: str):
         storage = self.get_storage()
         return name in storage[field]
 
-    def delete_storage_field(self, field: str, name: str):
-        storage = self.get_storage()
-        del storage[field][name]
-        self.save_storage(storage)
+    def delete_storage_field(self, field: str, name: str, flush: bool = True):
+        del self.get_storage()[field][name]
+        self._mark_changed(field, name, None, flush)
 
 
 class CtfdApi:
-    def __init__(self, admin_token: str = None, host: str = None, storage_path: str | Path = None):
-        self.connector = CtfdConnector(admin_token, host)
+    def __init__(
+        self,
+        admin_token: str = None,
+        host: str = None,
+        storage_path: str | Path = None,
+        max_concurrency: int = 16,
+        warmup: bool = False,
+        **client_kwargs,
+    ):
+        self.connector = CtfdConnector(admin_token, host, max_concurrency, warmup, **client_kwargs)
         self.storage = Storage(storage_path)
-        self.logger = logging.getLogger('ctfd')
+
+    @classmethod
+    async def create(
+        cls,
+        admin_token: str = None,
+        host: str = None,
+        storage_path: str | Path = None,
+        max_concurrency: int = 16,
+        **client_kwargs,
+    ):
+        api = cls(admin_token, host, storage_path, max_concurrency, **client_kwargs)
+        await api.awarmup()
+        return api
+
+    def warmup(self):
+        self.connector.warmup()
+
+    async def awarmup(self):
+        await self.connector.awarmup()
+
+    def close(self):
+        self.connector.close()
+        self.storage.flush()
+
+    async def aclose(self):
+        await self.connector.aclose()
+        self.storage.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
 
     def _create_user_core(self, response, username):
         data = response.json()['data']
-        storage = self.storage.get_storage()
-        storage['users'][username] = {'id': data['id'], 'team_id': None}
-        self.storage.save_storage(storage)
-        self.logger.info(f'Agent with username: {username} registered in CTFd')
+        self.storage.set_storage_field('users', username, {'id': data['id'], 'team_id': None})
+        logger.info(f'Agent with username: {username} registered in CTFd')
 
     def _create_user_request(self, username: str, is_admin=False):
         if self.storage.exist_in_field('users', username):
-            self.logger.info(f'User {username} already registered in CTFd')
-            raise CTFdException(f'User {username} already registered in CTFd')
+            logger.info(f'User {username} already registered in CTFd')
+            raise CTFdAlreadyExists(f'User {username} already registered in CTFd')
         return ('/users',), {
             'json': {
-                'banned': False,
+                **_USER_TEMPLATE,
                 'email': f'{username}@email.com',
-                'fields': [],
-                'hidden': False,
                 'name': username,
                 'password': username,
                 'type': 'admin' if is_admin else 'user',
-                'verified': True,
             }
         }
 
@@ -191,19 +377,9 @@ class CtfdApi:
 
     def _create_team_request(self, name: str):
         if self.storage.exist_in_field('teams', name):
-            self.logger.info(f'Team {name} already registered in CTFd')
-            raise CTFdException(f'Team {name} already registered in CTFd')
-        return ('/teams',), {
-            'json': {
-                'banned': False,
-                'country': 'CZ',
-                'email': f'{name}@copas.cz',
-                'fields': [],
-                'hidden': False,
-                'name': name,
-                'password': name,
-            }
-        }
+            logger.info(f'Team {name} already registered in CTFd')
+            raise CTFdAlreadyExists(f'Team {name} already registered in CTFd')
+        return ('/teams',), {'json': {**_TEAM_TEMPLATE, 'email': f'{name}@copas.cz', 'name': name, 'password': name}}
 
     def create_team(self, name: str):
         args, kwargs = self._create_team_request(name)
@@ -218,14 +394,13 @@ class CtfdApi:
     def _remove_user_from_team_request(self, user_name):
         user = self.storage.get_field_from_storage('users', user_name)
         if user['team_id'] is None:
-            self.logger.info(f'User {user_name} not assigned to any team')
+            logger.info(f'User {user_name} not assigned to any team')
             return None, None
-        return (f'teams/{user["team_id"]}/members',), {'json': {'user_id': user['id']}}
+        return ('/teams/%d/members' % user['team_id'],), {'json': {'user_id': user['id']}}
 
     def _remove_user_from_team_core(self, user_name):
-        storage = self.storage.get_storage()
-        storage['users'][user_name]['team_id'] = None
-        self.storage.save_storage(storage)
+        user = self.storage.get_field_from_storage('users', user_name)
+        self.storage.set_storage_field('users', user_name, {**user, 'team_id': None})
 
     def remove_user_from_team(self, user_name):
         args, kwargs = self._remove_user_from_team_request(user_name)
@@ -241,31 +416,36 @@ class CtfdApi:
         await self.connector.adelete(*args, **kwargs)
         self._remove_user_from_team_core(user_name)
 
-    def assign_user2team(self, user_name, team_name):
+    def _assign_user2team_request(self, user_name, team_name):
         user = self.storage.get_field_from_storage('users', user_name)
         team = self.storage.get_field_from_storage('teams', team_name)
         if user['team_id'] == team['id']:
-            self.logger.info(f'User {user_name} already assigned to team {team_name}')
+            logger.info(f'User {user_name} already assigned to team {team_name}')
+            return None, None, None
+        return user['team_id'], ('/teams/%d/members' % team['id'],), {'json': {'user_id': user['id']}}
+
+    def _assign_user2team_core(self, user_name, team_name):
+        user = self.storage.get_field_from_storage('users', user_name)
+        team = self.storage.get_field_from_storage('teams', team_name)
+        self.storage.set_storage_field('users', user_name, {**user, 'team_id': team['id']})
+
+    def assign_user2team(self, user_name, team_name):
+        previous_team_id, args, kwargs = self._assign_user2team_request(user_name, team_name)
+        if args is None:
             return
-        if user['team_id'] is not None:
+        if previous_team_id is not None:
             self.remove_user_from_team(user_name)
-        self.connector.post(f'/teams/{team["id"]}/members', json={'user_id': user["id"]})
-        storage = self.storage.get_storage()
-        storage['users'][user_name]['team_id'] = team['id']
-        self.storage.save_storage(storage)
+        self.connector.post(*args, **kwargs)
+        self._assign_user2team_core(user_name, team_name)
 
     async def aassign_user2team(self, user_name, team_name):
-        user = self.storage.get_field_from_storage('users', user_name)
-        team = self.storage.get_field_from_storage('teams', team_name)
-        if user['team_id'] == team['id']:
-            self.logger.info(f'User {user_name} already assigned to team {team_name}')
+        previous_team_id, args, kwargs = self._assign_user2team_request(user_name, team_name)
+        if args is None:
             return
-        if user['team_id'] is not None:
+        if previous_team_id is not None:
             await self.aremove_user_from_team(user_name)
-        await self.connector.apost(f'/teams/{team["id"]}/members', json={'user_id': user["id"]})
-        storage = self.storage.get_storage()
-        storage['users'][user_name]['team_id'] = team['id']
-        self.storage.save_storage(storage)
+        await self.connector.apost(*args, **kwargs)
+        self._assign_user2team_core(user_name, team_name)
 
     def _create_challenge_core(self, response, name):
         self.storage.update_storage_field_from_response(response, 'challenges', name)
@@ -280,8 +460,8 @@ class CtfdApi:
         challenge_type: str = 'standard',
     ):
         if self.storage.exist_in_field('challenges', name):
-            self.logger.info(f'Challenge {name} already registered in CTFd')
-            raise CTFdException(f'Challenge {name} already registered in CTFd')
+            logger.info(f'Challenge {name} already registered in CTFd')
+            raise CTFdAlreadyExists(f'Challenge {name} already registered in CTFd')
         return ('/challenges',), {
             'json': {
                 'category': category,
@@ -328,8 +508,8 @@ class CtfdApi:
         challenge = self.storage.get_field_from_storage('challenges', challenge_name)
         challenge_id = challenge['id']
         if self.storage.exist_in_field('flags', flag_name):
-            self.logger.info(f'Flag {flag_name} already registered in CTFd')
-            raise CTFdException(f'Flag {flag_name} already registered in CTFd')
+            logger.info(f'Flag {flag_name} already registered in CTFd')
+            raise CTFdAlreadyExists(f'Flag {flag_name} already registered in CTFd')
         return ('/flags',), {'json': {'challenge_id': challenge_id, 'content': flag, 'data': data, 'type': flag_type}}
 
     def create_flag(
@@ -361,79 +541,106 @@ class CtfdApi:
 
     def _delete_flag_request(self, name: str):
         field = self.storage.get_field_from_storage('flags', name)
-        flag_id = field['id']
-        return (f'/flags/{flag_id}',), {}
+        return ('/flags/%d' % field['id'],), {}
 
-    def _delete_flag_core(self, name: str):
-        self.storage.delete_storage_field('flags', name)
+    def _delete_flag_core(self, name: str, defer_save: bool = False):
+        self.storage.delete_storage_field('flags', name, flush=not defer_save)
 
-    def delete_flag(self, name: str):
+    def delete_flag(self, name: str, defer_save: bool = False):
         args, kwargs = self._delete_flag_request(name)
         self.connector.delete(*args, **kwargs)
-        self._delete_flag_core(name)
+        self._delete_flag_core(name, defer_save)
 
-    async def adelete_flag(self, name: str):
+    async def adelete_flag(self, name: str, defer_save: bool = False):
         args, kwargs = self._delete_flag_request(name)
         await self.connector.adelete(*args, **kwargs)
-        self._delete_flag_core(name)
+        self._delete_flag_core(name, defer_save)
 
-    async def adelete_user(self, name: str):
+    def _delete_user_request(self, name: str):
         user = self.storage.get_field_from_storage('users', name)
-        user_id = user['id']
-        await self.connector.adelete(f'/users/{user_id}')
-        self.storage.delete_storage_field('users', name)
+        return ('/users/%d' % user['id'],), {}
 
-    def delete_user(self, name: str):
-        user = self.storage.get_field_from_storage('users', name)
-        user_id = user['id']
-        self.connector.delete(f'/users/{user_id}')
-        self.storage.delete_storage_field('users', name)
+    def _delete_user_core(self, name: str, defer_save: bool = False):
+        self.storage.delete_storage_field('users', name, flush=not defer_save)
 
-    async def adelete_team(self, name: str):
-        team = self.storage.get_field_from_storage('teams', name)
-        team_id = team['id']
-        await self.connector.adelete(f'/teams/{team_id}')
-        self.storage.delete_storage_field('teams', name)
+    def delete_user(self, name: str, defer_save: bool = False):
+        args, kwargs = self._delete_user_request(name)
+        self.connector.delete(*args, **kwargs)
+        self._delete_user_core(name, defer_save)
 
-    def delete_team(self, name: str):
+    async def adelete_user(self, name: str, defer_save: bool = False):
+        args, kwargs = self._delete_user_request(name)
+        await self.connector.adelete(*args, **kwargs)
+        self._delete_user_core(name, defer_save)
+
+    def _delete_team_request(self, name: str):
         team = self.storage.get_field_from_storage('teams', name)
-        team_id = team['id']
-        self.connector.delete(f'/teams/{team_id}')
-        self.storage.delete_storage_field('teams', name)
+        return ('/teams/%d' % team['id'],), {}
 
-    async def adelete_challenge(self, name: str):
-        challenge = self.storage.get_field_from_storage('challenges', name)
-        challenge_id = challenge['id']
-        await self.connector.adelete(f'/challenges/{challenge_id}')
-        self.storage.delete_storage_field('challenges', name)
+    def _delete_team_core(self, name: str, defer_save: bool = False):
+        self.storage.delete_storage_field('teams', name, flush=not defer_save)
+
+    def delete_team(self, name: str, defer_save: bool = False):
+        args, kwargs = self._delete_team_request(name)
+        self.connector.delete(*args, **kwargs)
+        self._delete_team_core(name, defer_save)
+
+    async def adelete_team(self, name: str, defer_save: bool = False):
+        args, kwargs = self._delete_team_request(name)
+        await self.connector.adelete(*args, **kwargs)
+        self._delete_team_core(name, defer_save)
 
-    def delete_challenge(self, name: str):
+    def _delete_challenge_request(self, name: str):
         challenge = self.storage.get_field_from_storage('challenges', name)
-        challenge_id = challenge['id']
-        self.connector.delete(f'/challenges/{challenge_id}')
-        self.storage.delete_storage_field('challenges', name)
+        return ('/challenges/%d' % challenge['id'],), {}
+
+    def _delete_challenge_core(self, name: str, defer_save: bool = False):
+        self.storage.delete_storage_field('challenges', name, flush=not defer_save)
+
+    def delete_challenge(self, name: str, defer_save: bool = False):
+        args, kwargs = self._delete_challenge_request(name)
+        self.connector.delete(*args, **kwargs)
+        self._delete_challenge_core(name, defer_save)
+
+    async def adelete_challenge(self, name: str, defer_save: bool = False):
+        args, kwargs = self._delete_challenge_request(name)
+        await self.connector.adelete(*args, **kwargs)
+        self._delete_challenge_core(name, defer_save)
+
+    @staticmethod
+    async def _agather(*coroutines):
+        results = await asyncio.gather(*coroutines, return_exceptions=True)
+        errors = [result for result in results if isinstance(result, BaseException)]
+        for error in errors[1:]:
+            logger.warning(f'Additional failure during concurrent CTFd requests: {error!r}')
+        if errors:
+            raise errors[0]
 
     async def aclear(self):
         storage = self.storage.get_storage()
-        for user in storage['users']:
-            await self.adelete_user(user)
-        for team in storage['teams']:
-            await self.adelete_team(team)
-        for flag in storage['flags']:
-            await self.adelete_flag(flag)
-        for challenge in storage['challenges']:
-            await self.adelete_challenge(challenge)
+        try:
+            await self._agather(*(self.adelete_user(user, defer_save=True) for user in tuple(storage['users'])))
+            await self._agather(*(self.adelete_team(team, defer_save=True) for team in tuple(storage['teams'])))
+            await self._agather(*(self.adelete_flag(flag, defer_save=True) for flag in tuple(storage['flags'])))
+            await self._agather(
+                *(self.adelete_challenge(challenge, defer_save=True) for challenge in tuple(storage['challenges']))
+            )
+        finally:
+            self.storage.flush()
 
     def clear(self):
         storage = self.storage.get_storage()
-        for user in storage['users']:
-            self.delete_user(user)
-        for team in storage['teams']:
-            self.delete_team(team)
-        for flag in storage['flags']:
-            self.delete_flag(flag)
-        for challenge in storage['challenges']:
-            self.delete_challenge(challenge)
+        try:
+            for user in tuple(storage['users']):
+                self.delete_user(user, defer_save=True)
+            for team in tuple(storage['teams']):
+                self.delete_team(team, defer_save=True)
+            for flag in tuple(storage['flags']):
+                self.delete_flag(flag, defer_save=True)
+            for challenge in tuple(storage['challenges']):
+                self.delete_challenge(challenge, defer_save=True)
+        finally:
+            self.storage.flush()
 
 
 async def main():
@@ -466,6 +673,4 @@ async def main():
 
 
 if __name__ == '__main__':
-    import asyncio
-
     asyncio.run(main())
@@ -0,0 +1,218 @@
+import asyncio
+import itertools
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import httpx
+
+from ctfd_sdk.api import CtfdApi, CTFdAlreadyExists, CTFdException, Storage
+
+
+class MockCtfd:
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.requests = []
+        self.responses = {}
+
+    def __call__(self, request):
+        self.requests.append(request)
+        key = (request.method, request.url.path)
+        if key in self.responses:
+            response = self.responses[key]
+            if isinstance(response, BaseException):
+                raise response
+            return response
+        if request.method == 'POST':
+            return httpx.Response(200, json={'success': True, 'data': {'id': next(self.ids)}})
+        return httpx.Response(200, json={'success': True})
+
+
+class CtfdApiTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = Path(tmp_dir.name) / 'ctfd_storage.json'
+        self.server = MockCtfd()
+        self.api = CtfdApi('token', 'http://ctfd', self.path, transport=httpx.MockTransport(self.server))
+        self.addCleanup(self.api.close)
+
+    def read_file(self):
+        return json.loads(self.path.read_text())
+
+    def populate(self):
+        for i in range(3):
+            self.api.create_user(f'user{i}')
+            self.api.create_team(f'team{i}')
+            self.api.create_challenge(f'challenge{i}', 5)
+            self.api.create_flag(f'challenge{i}', f'flag{i}', 'flag')
+
+    def test_create_payloads(self):
+        self.api.create_user('user', is_admin=True)
+        self.api.create_team('team')
+        user, team = (json.loads(request.content) for request in self.server.requests)
+        self.assertEqual(
+            user,
+            {
+                'banned': False,
+                'email': 'user@email.com',
+                'fields': [],
+                'hidden': False,
+                'name': 'user',
+                'password': 'user',
+                'type': 'admin',
+                'verified': True,
+            },
+        )
+        self.assertEqual(
+            team,
+            {
+                'banned': False,
+                'country': 'CZ',
+                'email': 'team@copas.cz',
+                'fields': [],
+                'hidden': False,
+                'name': 'team',
+                'password': 'team',
+            },
+        )
+
+    def test_warmup_preconnects(self):
+        CtfdApi('token', 'http://ctfd', self.path, warmup=True, transport=httpx.MockTransport(self.server)).close()
+        self.assertEqual(
+            [(request.method, str(request.url)) for request in self.server.requests],
+            [('HEAD', 'http://ctfd/api/v1/users/me')],
+        )
+
+    def test_create_warms_up_async_client(self):
+        async def create():
+            async with await CtfdApi.create(
+                'token', 'http://ctfd', self.path, transport=httpx.MockTransport(self.server)
+            ):
+                self.assertEqual([request.method for request in self.server.requests], ['HEAD'])
+
+        asyncio.run(create())
+
+    def test_warmup_failure_is_logged(self):
+        def unreachable(request):
+            raise httpx.ConnectError('connection refused', request=request)
+
+        with self.assertLogs('ctfd', 'WARNING'):
+            CtfdApi('token', 'http://ctfd', self.path, warmup=True, transport=httpx.MockTransport(unreachable)).close()
+
+    def test_check_accepts_ok_statuses(self):
+        self.server.responses[('GET', '/api/v1/users')] = httpx.Response(201)
+        self.assertEqual(self.api.connector.get('/users').status_code, 201)
+
+    def test_check_raises_on_error_status(self):
+        self.server.responses[('GET', '/api/v1/users')] = httpx.Response(500, text='boom')
+        with self.assertRaises(CTFdException) as ctx:
+            self.api.connector.get('/users')
+        self.assertNotIsInstance(ctx.exception, CTFdAlreadyExists)
+        self.assertIn('GET', str(ctx.exception))
+        self.assertIn('boom', str(ctx.exception))
+
+    def test_duplicate_create_raises_already_exists(self):
+        self.server.responses[('POST', '/api/v1/users')] = httpx.Response(
+            400, json={'success': False, 'errors': {'name': ['User name has already been taken']}}
+        )
+        with self.assertRaises(CTFdAlreadyExists):
+            self.api.create_user('user')
+        self.assertEqual(self.read_file()['users'], {})
+
+    def test_duplicate_in_local_storage_raises_already_exists(self):
+        self.api.create_team('team')
+        with self.assertRaises(CTFdAlreadyExists):
+            self.api.create_team('team')
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_non_create_conflict_is_not_already_exists(self):
+        self.api.create_user('user')
+        self.api.create_team('team')
+        self.server.responses[('POST', '/api/v1/teams/2/members')] = httpx.Response(
+            400, json={'success': False, 'errors': {'id': ['User is already in a team']}}
+        )
+        with self.assertRaises(CTFdException) as ctx:
+            self.api.assign_user2team('user', 'team')
+        self.assertNotIsInstance(ctx.exception, CTFdAlreadyExists)
+
+    def test_assign_user2team_moves_user(self):
+        self.api.create_user('user')
+        self.api.create_team('team')
+        self.api.create_team('other')
+        self.api.assign_user2team('user', 'team')
+        self.api.assign_user2team('user', 'other')
+        asyncio.run(self.api.aassign_user2team('user', 'team'))
+        calls = [(request.method, request.url.path) for request in self.server.requests[3:]]
+        self.assertEqual(
+            calls,
+            [
+                ('POST', '/api/v1/teams/2/members'),
+                ('DELETE', '/api/v1/teams/2/members'),
+                ('POST', '/api/v1/teams/3/members'),
+                ('DELETE', '/api/v1/teams/3/members'),
+                ('POST', '/api/v1/teams/2/members'),
+            ],
+        )
+        self.assertEqual(json.loads(self.server.requests[-1].content), {'user_id': 1})
+        self.assertEqual(self.read_file()['users']['user'], {'id': 1, 'team_id': 2})
+
+    def test_assign_user2team_to_same_team_is_noop(self):
+        self.api.create_user('user')
+        self.api.create_team('team')
+        self.api.assign_user2team('user', 'team')
+        self.api.assign_user2team('user', 'team')
+        self.assertEqual(len(self.server.requests), 3)
+
+    def test_concurrent_requests_are_bounded(self):
+        in_flight = peak = 0
+
+        async def handler(request):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json={'success': True, 'data': {'id': 1}})
+
+        async def create_users():
+            async with CtfdApi('token', 'http://ctfd', self.path, 4, transport=httpx.MockTransport(handler)) as api:
+                await asyncio.gather(*(api.acreate_user(f'user{i}') for i in range(40)))
+
+        asyncio.run(create_users())
+        self.assertEqual(peak, 4)
+        self.assertEqual(len(self.read_file()['users']), 40)
+
+    def test_clear_writes_storage_once(self):
+        self.populate()
+        with mock.patch.object(Storage, '_write', wraps=self.api.storage._write) as write:
+            self.api.clear()
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(self.read_file(), {'users': {}, 'teams': {}, 'challenges': {}, 'flags': {}})
+
+    def test_aclear_writes_storage_once(self):
+        self.populate()
+        with mock.patch.object(Storage, '_write', wraps=self.api.storage._write) as write:
+            asyncio.run(self.api.aclear())
+        self.assertEqual(write.call_count, 1)
+        self.assertEqual(self.read_file(), {'users': {}, 'teams': {}, 'challenges': {}, 'flags': {}})
+
+    def test_aclear_saves_successful_deletes_on_failure(self):
+        self.populate()
+        self.server.responses[('DELETE', '/api/v1/users/5')] = httpx.Response(500, text='boom')
+        with self.assertRaises(CTFdException):
+            asyncio.run(self.api.aclear())
+        self.assertEqual(self.read_file()['users'], {'user1': {'id': 5, 'team_id': None}})
+
+    def test_aclear_propagates_cancellation(self):
+        self.populate()
+        self.server.responses[('DELETE', '/api/v1/users/5')] = asyncio.CancelledError()
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(self.api.aclear())
+        self.assertEqual(self.read_file()['users'], {'user1': {'id': 5, 'team_id': None}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import asyncio
+import gc
+import json
+import threading
+import unittest
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from ctfd_sdk.api import CtfdConnector, CTFdException
+
+
+class CtfdHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        body = json.dumps({'success': True, 'data': {'id': 1}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    do_GET = do_HEAD = do_POST = do_PATCH = do_DELETE = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalServerTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), CtfdHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.host = f'http://127.0.0.1:{cls.server.server_address[1]}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def assertNoResourceWarnings(self, func):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            func()
+            gc.collect()
+        self.assertEqual([str(w.message) for w in caught if issubclass(w.category, ResourceWarning)], [])
+
+
+class CtfdConnectorTest(LocalServerTestCase):
+    def test_requests_use_base_url_and_auth(self):
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200)
+
+        async def aget():
+            async with CtfdConnector('token', 'http://ctfd/', transport=httpx.MockTransport(handler)) as connector:
+                await connector.aget('/teams')
+
+        with CtfdConnector('token', 'http://ctfd/', transport=httpx.MockTransport(handler)) as connector:
+            connector.get('/users')
+        asyncio.run(aget())
+        self.assertEqual(
+            [str(request.url) for request in requests], ['http://ctfd/api/v1/users', 'http://ctfd/api/v1/teams']
+        )
+        self.assertTrue(all(request.headers['Authorization'] == 'Token token' for request in requests))
+
+    def test_sync_client_is_recreated_after_close(self):
+        connector = CtfdConnector('token', self.host)
+        for _ in range(2):
+            self.assertEqual(connector.get('/users').status_code, 200)
+            connector.close()
+
+    def test_async_batches_in_separate_event_loops(self):
+        connector = CtfdConnector('token', self.host)
+
+        async def batch():
+            async with connector:
+                await asyncio.gather(*(connector.aget('/users') for _ in range(10)))
+                connector.get('/users')
+
+        def run():
+            for _ in range(2):
+                asyncio.run(batch())
+
+        self.assertNoResourceWarnings(run)
+
+    def test_sync_close_releases_async_client_of_open_loop(self):
+        def run():
+            connector = CtfdConnector('token', self.host)
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(connector.aget('/users'))
+                connector.close()
+            finally:
+                loop.close()
+
+        self.assertNoResourceWarnings(run)
+
+    def test_switching_event_loop_without_aclose_raises(self):
+        connector = CtfdConnector('token', self.host)
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(connector.aget('/users'))
+            with self.assertRaises(CTFdException):
+                asyncio.run(connector.aget('/users'))
+            connector.close()
+        finally:
+            loop.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
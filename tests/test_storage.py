@@ -0,0 +1,108 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from ctfd_sdk.api import CTFdException, Storage, orjson
+
+
+class StorageTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.path = Path(tmp_dir.name) / 'ctfd_storage.json'
+        self.storage = Storage(self.path)
+
+    def read_file(self):
+        return json.loads(self.path.read_text())
+
+    def test_creates_empty_storage(self):
+        empty = {'users': {}, 'teams': {}, 'challenges': {}, 'flags': {}}
+        self.assertEqual(self.storage.get_storage(), empty)
+        self.assertEqual(self.read_file(), empty)
+
+    def test_loads_existing_file_once(self):
+        self.path.write_text(json.dumps({'users': {'u': {'id': 1}}, 'teams': {}, 'challenges': {}, 'flags': {}}))
+        with mock.patch.object(Storage, '_read', wraps=self.storage._read) as read:
+            first = self.storage.get_storage()
+            self.assertIs(self.storage.get_storage(), first)
+            self.assertEqual(self.storage.get_field_from_storage('users', 'u'), {'id': 1})
+        self.assertEqual(read.call_count, 1)
+
+    def test_missing_field_raises(self):
+        with self.assertRaises(CTFdException):
+            self.storage.get_field_from_storage('users', 'missing')
+
+    def test_save_writes_through_by_default(self):
+        storage = self.storage.get_storage()
+        storage['teams']['t'] = {'id': 2}
+        self.storage.save_storage(storage)
+        self.assertEqual(self.read_file()['teams'], {'t': {'id': 2}})
+
+    def test_deferred_changes_are_written_on_flush(self):
+        storage = self.storage.get_storage()
+        storage['teams']['t'] = {'id': 2}
+        self.storage.save_storage(storage, flush=False)
+        self.assertEqual(self.read_file()['teams'], {})
+        self.storage.delete_storage_field('teams', 't', flush=False)
+        storage['teams']['t2'] = {'id': 3}
+        self.storage.save_storage(storage, flush=False)
+        self.storage.flush()
+        self.assertEqual(self.read_file()['teams'], {'t2': {'id': 3}})
+
+    def test_flush_without_changes_does_not_write(self):
+        self.storage.get_storage()
+        with mock.patch.object(Storage, '_write') as write:
+            self.storage.flush()
+        write.assert_not_called()
+
+    def test_write_replaces_file_atomically(self):
+        self.storage.get_storage()
+        with mock.patch('ctfd_sdk.api.os.replace', side_effect=OSError('replace failed')):
+            with self.assertRaises(OSError):
+                self.storage.save_storage({'users': {'u': {'id': 1}}, 'teams': {}, 'challenges': {}, 'flags': {}})
+        self.assertEqual(self.read_file()['users'], {})
+        self.storage.save_storage(self.storage.get_storage())
+        self.assertEqual(self.read_file()['users'], {'u': {'id': 1}})
+        self.assertEqual(list(self.path.parent.iterdir()), [self.path])
+
+    def test_flush_merges_changes_from_other_instances(self):
+        other = Storage(self.path)
+        self.storage.get_storage()
+        other.get_storage()
+        self.storage.set_storage_field('users', 'alice', {'id': 1, 'team_id': None})
+        other.set_storage_field('users', 'bob', {'id': 2, 'team_id': None})
+        self.assertEqual(set(self.read_file()['users']), {'alice', 'bob'})
+        self.assertEqual(set(other.get_storage()['users']), {'alice', 'bob'})
+
+        self.storage.delete_storage_field('users', 'alice')
+        other.set_storage_field('teams', 'team', {'id': 3}, flush=False)
+        other.delete_storage_field('users', 'bob', flush=False)
+        other.flush()
+        self.assertEqual(self.read_file(), {'users': {}, 'teams': {'team': {'id': 3}}, 'challenges': {}, 'flags': {}})
+
+    @mock.patch('ctfd_sdk.api.orjson', None)
+    def test_json_fallback_write(self):
+        storage = self.storage.get_storage()
+        self.storage.set_storage_field('users', 'user', {'id': 1, 'team_id': None})
+        self.assertEqual(self.path.read_text(), json.dumps(storage))
+
+    @mock.patch('ctfd_sdk.api.orjson', None)
+    def test_json_fallback_read(self):
+        content = {'users': {'user': {'id': 1, 'team_id': None}}, 'teams': {}, 'challenges': {}, 'flags': {}}
+        self.path.write_text(json.dumps(content, indent=2))
+        self.assertEqual(self.storage.get_storage(), content)
+
+    @unittest.skipIf(orjson is None, 'orjson is not installed')
+    def test_orjson_and_json_files_are_interchangeable(self):
+        content = {'users': {'ú': {'id': 1, 'team_id': None}}, 'teams': {}, 'challenges': {}, 'flags': {}}
+        self.storage._write(content)
+        with mock.patch('ctfd_sdk.api.orjson', None):
+            self.assertEqual(Storage(self.path).get_storage(), content)
+            Storage(self.path)._write(content)
+        self.assertEqual(Storage(self.path).get_storage(), content)
+
+
+if __name__ == '__main__':
+    unittest.main()